@@ -1,9 +1,11 @@
+import argparse
 import configparser
 from InquirerPy import inquirer
 from InquirerPy.base.control import Choice
 import os
 import shutil
 import subprocess
+import sys
 import yaml
 
 
@@ -31,11 +33,10 @@ class Dojo:
             return True
         
         # Checks if repo contains any folders with module.yml file in them
-        folders = [d for d in os.listdir() if os.path.isdir(d)]
-        for folder in folders:
-            filepath = os.path.join(folder, 'module.yml')
-            if os.path.exists(filepath):
-                return True
+        with os.scandir() as entries:
+            for entry in entries:
+                if entry.is_dir() and os.path.exists(os.path.join(entry.path, 'module.yml')):
+                    return True
 
         return False
 
@@ -47,6 +48,124 @@ class Dojo:
         self._data = dojo_data
         self.write_yml()
 
+    def sync(self) -> bool:
+        # Returns False if dojo.yml or a module.yml file could not be synced
+        if not os.path.exists(self.filepath):
+            print('Dojo is not initialized')
+            return False
+
+        try:
+            data = self.data
+        except (ValueError, yaml.YAMLError) as e:
+            print(f"Failed to read '{self.filepath}': {e}")
+            return False
+        modules = data.get('modules') or [] if isinstance(data, dict) else None
+        if not isinstance(modules, list) or not all(isinstance(module, dict) for module in modules):
+            print(f"Failed to read '{self.filepath}': expected a mapping with a list of modules")
+            return False
+
+        # Submodule paths from .gitmodules (read() skips a missing file)
+        gitmodules = configparser.ConfigParser()
+        gitmodules.read('.gitmodules')
+        submodule_paths = {
+            gitmodules.get(section, 'path')
+            for section in gitmodules.sections() if gitmodules.has_option(section, 'path')
+        }
+
+        # Walk the repository once, recording for each folder whether it is a
+        # submodule, whether it has a module.yml file, which subfolders exist and
+        # which of those look like challenges (Challenge.create writes
+        # DESCRIPTION.md and verify). Submodules count as existing but are never
+        # added or looked into.
+        folders = {}
+        with os.scandir() as entries:
+            for entry in entries:
+                if entry.name.startswith('.') or not entry.is_dir():
+                    continue
+                is_submodule = entry.name in submodule_paths
+                has_module_yml = False
+                subfolders = set()
+                challenge_ids = set()
+                if not is_submodule:
+                    with os.scandir(entry.path) as sub_entries:
+                        for sub_entry in sub_entries:
+                            if sub_entry.name == 'module.yml':
+                                has_module_yml = sub_entry.is_file()
+                            elif not sub_entry.name.startswith('.') and sub_entry.is_dir():
+                                subfolders.add(sub_entry.name)
+                                if f'{entry.name}/{sub_entry.name}' in submodule_paths:
+                                    continue
+                                if (os.path.exists(os.path.join(sub_entry.path, 'DESCRIPTION.md'))
+                                        or os.path.exists(os.path.join(sub_entry.path, 'verify'))):
+                                    challenge_ids.add(sub_entry.name)
+                folders[entry.name] = (is_submodule, has_module_yml, subfolders, challenge_ids)
+
+        # Every change is worked out before anything is written, so a module.yml
+        # file that can't be read never leaves the other files half-synced
+        success = True
+        changed_modules = []
+
+        # Drop dojo.yml entries for module folders that no longer exist, then add
+        # folders containing a module.yml file that dojo.yml doesn't list yet.
+        # Imported modules and modules with inline challenges have no folder.
+        kept_modules = []
+        seen_ids = set()
+        for module in modules:
+            module_id = module.get('id')
+            if module_id is not None and 'import' not in module and 'challenges' not in module:
+                if module_id in seen_ids:
+                    print(f"Removing duplicate module '{module_id}' from dojo.yml")
+                    continue
+                if module_id not in folders:
+                    print(f"Removing module '{module_id}' from dojo.yml, directory does not exist")
+                    continue
+            if module_id is not None:
+                seen_ids.add(module_id)
+            kept_modules.append(module)
+
+        local_modules = {module['id']: module for module in kept_modules
+                         if module.get('id') is not None and 'import' not in module and 'challenges' not in module}
+        modules_changed = len(kept_modules) != len(modules)
+        for folder in sorted(folders):
+            is_submodule, has_module_yml, subfolders, challenge_ids = folders[folder]
+            if is_submodule:
+                continue
+            if folder in local_modules:
+                module = Module(folder)
+                result = module.sync(subfolders, challenge_ids, local_modules[folder].get('name'))
+            elif has_module_yml and folder not in seen_ids:
+                module = Module(folder)
+                result = module.sync(subfolders, challenge_ids)
+                if result is not None:
+                    print(f"Adding module '{folder}' to dojo.yml")
+                    kept_modules.append({'id': folder, 'name': module.data.get('name') or folder})
+                    modules_changed = True
+            else:
+                if folder not in seen_ids:
+                    print(f"Skipping unmanaged folder '{folder}', not listed in dojo.yml and has no module.yml file")
+                continue
+
+            if result is None:
+                success = False
+            elif result:
+                changed_modules.append(module)
+
+        # Missing submodule folders are only reported; removing the entry from
+        # .gitmodules alone would leave the gitlink in the index without a mapping
+        for path in sorted(submodule_paths):
+            if not os.path.exists(path):
+                print(f"Submodule '{path}' in .gitmodules has no directory, run 'git submodule update --init' to restore it")
+
+        for module in changed_modules:
+            module.write_yml()
+        if modules_changed:
+            self.data['modules'] = kept_modules
+            self.write_yml()
+
+        if success and not changed_modules and not modules_changed:
+            print('Dojo is already in sync with the filesystem')
+        return success
+
 
 class Module:
     def __init__(self, id=None) -> None:
@@ -111,6 +230,56 @@ class Module:
             pass
         print(' Done')
 
+    def sync(self, subfolders: set, challenge_ids: set, name=None):
+        # Reconciles module.yml challenges with the folders on disk without
+        # writing the file. Recreates module.yml data if the file is missing or
+        # empty. Returns True if it needs to be written, False if nothing changed
+        # and None if module.yml could not be read.
+        self.filepath = os.path.join(self.id, 'module.yml')
+        try:
+            data = self.data
+            changed = False
+        except (FileNotFoundError, ValueError):
+            print(f"Creating missing or empty module.yml file in '{self.id}'")
+            data = self._data = {'name': name or self.id, 'challenges': []}
+            changed = True
+        except yaml.YAMLError as e:
+            print(f"Failed to read '{self.filepath}', skipping: {e}")
+            return None
+
+        challenges = data.get('challenges') or [] if isinstance(data, dict) else None
+        if not isinstance(challenges, list) or not all(isinstance(challenge, dict) for challenge in challenges):
+            print(f"Failed to read '{self.filepath}', skipping: expected a mapping with a list of challenges")
+            return None
+
+        # Imported challenges have no folder
+        kept_challenges = []
+        seen_ids = set()
+        for challenge in challenges:
+            challenge_id = challenge.get('id')
+            if challenge_id is not None and 'import' not in challenge:
+                if challenge_id in seen_ids:
+                    print(f"Removing duplicate challenge '{challenge_id}' from '{self.filepath}'")
+                    continue
+                if challenge_id not in subfolders:
+                    print(f"Removing challenge '{challenge_id}' from '{self.filepath}', directory does not exist")
+                    continue
+            if challenge_id is not None:
+                seen_ids.add(challenge_id)
+            kept_challenges.append(challenge)
+
+        for challenge_id in sorted(challenge_ids - seen_ids):
+            print(f"Adding challenge '{challenge_id}' to '{self.filepath}'")
+            kept_challenges.append({'id': challenge_id, 'name': challenge_id, 'allow_privileged': False})
+
+        for folder in sorted(subfolders - challenge_ids - seen_ids):
+            print(f"Skipping unlisted folder '{os.path.join(self.id, folder)}', it has no DESCRIPTION.md or verify file or is a submodule")
+
+        if changed or kept_challenges != challenges:
+            data['challenges'] = kept_challenges
+            return True
+        return False
+
     def delete(self) -> None:
         # Delete folder
         if os.path.exists(self.id):
@@ -319,6 +488,7 @@ class Menu:
         choices = [
             Choice(name='Edit Modules', value='module'),
             Choice(name='Edit Challenges', value='challenge'),
+            Choice(name='Sync With Filesystem', value=self.dojo.sync),
             Choice(name='Quit', value=None)
         ]
 
@@ -651,4 +821,11 @@ class Menu:
 
 
 if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Manage the dojo. Opens an interactive menu when no command is given.')
+    parser.add_argument('command', nargs='?', choices=['sync'],
+                        help='sync dojo.yml and module.yml files with the folders on disk')
+    args = parser.parse_args()
+
+    if args.command == 'sync':
+        sys.exit(0 if Dojo().sync() else 1)
     Menu().display()